@@ -0,0 +1,176 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tno.aimms_adapter.data_types import ModelState, OperaAdapterConfig
+from tno.aimms_adapter.model.model import Model
+
+
+class DummyModel(Model):
+    def process_results(self, result):
+        return result['esdl']
+
+
+def create_model(minio_endpoint=None):
+    with mock.patch("tno.aimms_adapter.model.model.EnvSettings.minio_endpoint", return_value=minio_endpoint), \
+            mock.patch("tno.aimms_adapter.model.model.Minio") as minio:
+        minio.return_value.list_buckets.return_value = []
+        return DummyModel()
+
+
+def initialized_run(model, output_path):
+    model_run_id = model.request().model_run_id
+    model.initialize(model_run_id, OperaAdapterConfig(output_esdl_file_path=output_path))
+    return model_run_id
+
+
+class TestStoreResult(unittest.TestCase):
+    def test_file_scheme_writes_to_disk(self):
+        model = create_model()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "output.esdl")
+            model_run_id = initialized_run(model, "file://" + filename)
+
+            info = model.store_result(model_run_id, {'esdl': "<esdl>é</esdl>\n"})
+
+            self.assertEqual(info.state, ModelState.SUCCEEDED)
+            with open(filename, 'rb') as file:
+                self.assertEqual(file.read(), "<esdl>é</esdl>\n".encode('utf-8'))
+
+    def test_file_scheme_writes_to_disk_when_minio_configured(self):
+        model = create_model("localhost:9000")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "output.esdl")
+            model_run_id = initialized_run(model, "file://" + filename)
+
+            model.store_result(model_run_id, {'esdl': "<esdl/>"})
+
+            self.assertTrue(os.path.exists(filename))
+            model.minio_client.put_object.assert_not_called()
+
+    def test_minio_paths_with_and_without_scheme(self):
+        for path in ["opera-test/output/result.esdl", "s3://opera-test/output/result.esdl"]:
+            model = create_model("localhost:9000")
+            model_run_id = initialized_run(model, path)
+
+            model.store_result(model_run_id, {'esdl': "<esdl/>"})
+
+            args = model.minio_client.put_object.call_args[0]
+            self.assertEqual(args[0], "opera-test")
+            self.assertEqual(args[1], "output/result.esdl")
+            self.assertEqual(model.results(model_run_id).result, {"path": path})
+
+    def test_unknown_scheme_raises(self):
+        model = create_model("localhost:9000")
+        model_run_id = initialized_run(model, "ftp://host/result.esdl")
+
+        with self.assertRaises(IOError):
+            model.store_result(model_run_id, {'esdl': "<esdl/>"})
+
+    def test_minio_path_without_minio_raises(self):
+        model = create_model()
+        model_run_id = initialized_run(model, "opera-test/result.esdl")
+
+        with self.assertRaises(IOError):
+            model.store_result(model_run_id, {'esdl': "<esdl/>"})
+
+
+class TestLoadFromMinio(unittest.TestCase):
+    def test_paths_with_and_without_scheme(self):
+        for path in ["opera-test/input/MACRO 16.esdl", "s3://opera-test/input/MACRO 16.esdl"]:
+            model = create_model("localhost:9000")
+            model.minio_client.get_object.return_value.read.return_value = b"<esdl/>"
+
+            self.assertEqual(model.load_from_minio(path), b"<esdl/>")
+            model.minio_client.get_object.assert_called_once_with("opera-test", "input/MACRO 16.esdl")
+            model.minio_client.get_object.return_value.release_conn.assert_called_once()
+
+    def test_unknown_scheme_raises(self):
+        model = create_model("localhost:9000")
+
+        with self.assertRaises(IOError):
+            model.load_from_minio("ftp://host/input.esdl")
+        model.minio_client.get_object.assert_not_called()
+
+
+class TestResults(unittest.TestCase):
+    def test_results_follow_store_result(self):
+        model = create_model()
+        model_run_id = initialized_run(model, "opera-test/result.esdl")
+        model.status(model_run_id)
+        run = model.model_run_dict[model_run_id]
+        run.result = {'esdl': "<esdl/>"}
+        first = model.results(model_run_id)
+
+        # empty result, so store_result() replaces run.result without writing anything
+        model.store_result(model_run_id, {'esdl': ""})
+
+        second = model.results(model_run_id)
+        self.assertEqual(first.result, {'esdl': "<esdl/>"})
+        self.assertEqual(second.result, {"result": ""})
+        self.assertIsNot(first, second)
+
+    def test_changing_returned_info_does_not_affect_later_calls(self):
+        model = create_model()
+        model_run_id = initialized_run(model, "opera-test/result.esdl")
+
+        model.status(model_run_id).state = ModelState.ERROR
+        model.results(model_run_id).state = ModelState.ERROR
+
+        self.assertEqual(model.status(model_run_id).state, ModelState.SUCCEEDED)
+        self.assertEqual(model.results(model_run_id).state, ModelState.SUCCEEDED)
+
+    def test_results_after_remove(self):
+        model = create_model()
+        model_run_id = initialized_run(model, "opera-test/result.esdl")
+        model.status(model_run_id)
+        model.results(model_run_id)
+
+        model.remove(model_run_id)
+
+        self.assertEqual(model.status(model_run_id).state, ModelState.ERROR)
+        self.assertEqual(model.results(model_run_id).state, ModelState.ERROR)
+
+
+class TestRemove(unittest.TestCase):
+    @staticmethod
+    def pending_run(model):
+        # same as Opera.request() when another model is already running
+        model_run_id = model.request().model_run_id
+        model.model_run_dict[model_run_id].state = ModelState.PENDING
+        model._pending[model_run_id] = None
+        return model_run_id
+
+    def test_remove_accepts_oldest_pending_run(self):
+        model = create_model()
+        running_id = model.request().model_run_id
+        first_pending_id = self.pending_run(model)
+        second_pending_id = self.pending_run(model)
+
+        info = model.remove(running_id)
+
+        self.assertEqual(info.state, ModelState.UNKNOWN)
+        self.assertEqual(model.model_run_dict[first_pending_id].state, ModelState.ACCEPTED)
+        self.assertEqual(model.model_run_dict[second_pending_id].state, ModelState.PENDING)
+
+    def test_remove_skips_removed_pending_run(self):
+        model = create_model()
+        running_id = model.request().model_run_id
+        first_pending_id = self.pending_run(model)
+        second_pending_id = self.pending_run(model)
+
+        model.remove(first_pending_id)
+        self.assertEqual(model.model_run_dict[second_pending_id].state, ModelState.ACCEPTED)
+
+        model.remove(running_id)
+        self.assertEqual(model.model_run_dict[second_pending_id].state, ModelState.ACCEPTED)
+
+    def test_remove_unknown_run(self):
+        model = create_model()
+
+        self.assertEqual(model.remove("unknown").state, ModelState.ERROR)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 from enum import Enum
 from typing import Dict, Optional, Any, ClassVar, Type, List
 from marshmallow_dataclass import dataclass
+import dataclasses
 from dataclasses import field
 
 from marshmallow import Schema, fields
@@ -25,8 +26,13 @@ class OperaAdapterConfig:
     base_path: Optional[str] = None
 
 
-@dataclass
+# internal bookkeeping only, never (de)serialized, so no Marshmallow schema is needed
+@dataclasses.dataclass
 class ModelRun:
+    # one instance is kept per model run, so avoid a per-instance __dict__
+    # (explicit __slots__ instead of slots=True, which needs Python 3.10)
+    __slots__ = ("state", "config", "result")
+
     state: ModelState
     config: OperaAdapterConfig
     result: dict
@@ -1,8 +1,13 @@
+import os
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import timedelta
 from io import BytesIO
-from typing import Dict
+from typing import Callable, Dict, Set
 from uuid import uuid4
 
+import certifi
+import urllib3
 from minio import Minio
 
 from tno.aimms_adapter.settings import EnvSettings
@@ -11,30 +16,64 @@ from tno.shared.log import get_logger
 
 logger = get_logger(__name__)
 
+# large results are uploaded to Minio as a multipart upload in parts of this size
+MINIO_PART_SIZE = 10 * 1024 * 1024
+
+
+def split_scheme(path: str):
+    """Split a storage path into (scheme, rest), paths without a scheme refer to the Minio object store"""
+    scheme, sep, rest_of_path = path.partition("://")
+    if not sep:
+        return "s3", path
+    return scheme, rest_of_path
+
 
 class Model(ABC):
     def __init__(self):
         self.model_run_dict: Dict[str, ModelRun] = {}
+        # model_run_ids in PENDING state, oldest first
+        self._pending: OrderedDict[str, None] = OrderedDict()
 
         self.minio_client = None
+        # buckets known to exist, so store_result() can skip the bucket_exists() round trip
+        self._known_buckets: Set[str] = set()
         if EnvSettings.minio_endpoint():
             logger.info(f"Connecting to Minio Object Store at {EnvSettings.minio_endpoint()}")
+            # minio's default connection pool (minio 7.1.9), with a configurable pool size.
+            # The Minio client clears the pool when it is garbage collected.
+            timeout = timedelta(minutes=5).seconds
+            http_client = urllib3.PoolManager(
+                timeout=urllib3.util.Timeout(connect=timeout, read=timeout),
+                maxsize=EnvSettings.minio_pool_size(),
+                cert_reqs='CERT_REQUIRED',
+                ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+                retries=urllib3.Retry(
+                    total=5,
+                    backoff_factor=0.2,
+                    status_forcelist=[500, 502, 503, 504]
+                )
+            )
             self.minio_client = Minio(
                 endpoint=EnvSettings.minio_endpoint(),
                 secure=EnvSettings.minio_secure(),
                 access_key=EnvSettings.minio_access_key(),
-                secret_key=EnvSettings.minio_secret_key()
+                secret_key=EnvSettings.minio_secret_key(),
+                http_client=http_client
             )
             buckets = self.minio_client.list_buckets()
-
-            for bucket in buckets:
-                logger.info(f" - Bucket: {bucket.name}, created {bucket.creation_date}")
+            self._known_buckets.update(bucket.name for bucket in buckets)
+            logger.info(f"Buckets: {', '.join(f'{b.name} (created {b.creation_date})' for b in buckets)}")
 
         else:
             logger.info("No Minio Object Store configured")
 
+        # result writers per URI scheme, see store_result()
+        self._writers: Dict[str, Callable[[str, bytes], None]] = {"file": self._write_file}
+        if self.minio_client:
+            self._writers["s3"] = self._write_minio
+
     def request(self):
-        model_run_id = str(uuid4())
+        model_run_id = uuid4().hex
         self.model_run_dict[model_run_id] = ModelRun(
             state=ModelState.ACCEPTED,
             config=None,
@@ -47,149 +86,161 @@ class Model(ABC):
         )
 
     def initialize(self, model_run_id: str, config=None):
-        if model_run_id in self.model_run_dict:
-            self.model_run_dict[model_run_id].config = config
-            self.model_run_dict[model_run_id].state = ModelState.READY
-            return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
-                model_run_id=model_run_id,
-            )
-        else:
+        run = self.model_run_dict.get(model_run_id)
+        if run is None:
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.ERROR,
                 reason="Error in Model.initialize(): model_run_id unknown"
             )
 
+        run.config = config
+        run.state = ModelState.READY
+        return ModelRunInfo(
+            state=run.state,
+            model_run_id=model_run_id,
+        )
+
     def load_from_minio(self, path):
-        bucket = path.split("/")[0]
-        rest_of_path = "/".join(path.split("/")[1:])
+        scheme, path = split_scheme(path)
+        if scheme != "s3":
+            raise IOError(f"Don't know how to load {scheme}://{path} from Minio")
+        bucket, _, rest_of_path = path.partition("/")
 
         response = self.minio_client.get_object(bucket, rest_of_path)
         if response:
             logger.info(f"Minio response: {response}")
-            return response.data
+            try:
+                return response.read()
+            finally:
+                # hand the connection back to the pool
+                response.close()
+                response.release_conn()
         else:
             logger.error(f"Failed to retrieve from Minio: bucket={bucket}, path={rest_of_path}")
             return None
 
+    def _write_file(self, filename, encoded: bytes):
+        logger.info("Writing result ESDL to disk: " + filename)
+        with open(filename, 'wb') as file:
+            file.write(encoded)
+
+    def _write_minio(self, path, encoded: bytes):
+        bucket, _, rest_of_path = path.partition("/")
+
+        if bucket not in self._known_buckets:
+            if not self.minio_client.bucket_exists(bucket):
+                self.minio_client.make_bucket(bucket)
+            self._known_buckets.add(bucket)
+
+        self.minio_client.put_object(bucket, rest_of_path, BytesIO(encoded), len(encoded),
+                                     part_size=MINIO_PART_SIZE)
+
     @abstractmethod
     def process_results(self, result):
         pass
 
     def store_result(self, model_run_id: str, result):
-        if model_run_id in self.model_run_dict:
-            res = self.process_results(result)
-            if res:
-                path = self.model_run_dict[model_run_id].config.output_esdl_file_path
-                if self.minio_client:
-                    content = BytesIO(bytes(res, 'utf8'))
-
-                    bucket = path.split("/")[0]
-                    rest_of_path = "/".join(path.split("/")[1:])
-
-                    if not self.minio_client.bucket_exists(bucket):
-                        self.minio_client.make_bucket(bucket)
-
-                    self.minio_client.put_object(bucket, rest_of_path, content, content.getbuffer().nbytes)
-                else:
-                    if path[:7] == 'file://': # local file
-                        filename = path[7:]
-                        logger.info("Writing result ESDL to disk: " + filename)
-                        with open(filename, 'w') as file:
-                            file.write(res)
-                    else:
-                        raise IOError("Don't know how to write file " + path)
-
-                self.model_run_dict[model_run_id].result = {
-                    "path": path
-                }
-            else:
-                self.model_run_dict[model_run_id].result = {
-                    "result": res
-                }
-            return ModelRunInfo(
-                model_run_id=model_run_id,
-                state=ModelState.SUCCEEDED,
-            )
-        else:
+        run = self.model_run_dict.get(model_run_id)
+        if run is None:
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.ERROR,
                 reason="Error in Model.store_result(): model_run_id unknown"
             )
 
-    def run(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
-            state = self.model_run_dict[model_run_id].state
-            if state != ModelState.READY:
-                res = ModelRunInfo(
-                    state=self.model_run_dict[model_run_id].state,
-                    model_run_id=model_run_id,
-                    reason="Error: Model is not in READY state"
-                )
-                return res
-
-            self.model_run_dict[model_run_id].state = ModelState.RUNNING
-            return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
-                model_run_id=model_run_id,
-            )
+        res = self.process_results(result)
+        if res:
+            path = run.config.output_esdl_file_path
+            scheme, rest_of_path = split_scheme(path)
+            writer = self._writers.get(scheme)
+            if writer is None:
+                raise IOError("Don't know how to write file " + path)
+            writer(rest_of_path, res.encode('utf-8'))
+
+            run.result = {
+                "path": path
+            }
         else:
+            run.result = {
+                "result": res
+            }
+        return ModelRunInfo(
+            model_run_id=model_run_id,
+            state=ModelState.SUCCEEDED,
+        )
+
+    def run(self, model_run_id: str):
+        run = self.model_run_dict.get(model_run_id)
+        if run is None:
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.ERROR,
                 reason="Error in Model.run(): model_run_id unknown"
             )
 
-    def status(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
-            # Dummy behaviour: Query status once, to let finish model
-            self.model_run_dict[model_run_id].state = ModelState.SUCCEEDED
-
+        if run.state != ModelState.READY:
             return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
+                state=run.state,
                 model_run_id=model_run_id,
+                reason="Error: Model is not in READY state"
             )
-        else:
+
+        run.state = ModelState.RUNNING
+        return ModelRunInfo(
+            state=run.state,
+            model_run_id=model_run_id,
+        )
+
+    def status(self, model_run_id: str):
+        run = self.model_run_dict.get(model_run_id)
+        if run is None:
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.ERROR,
                 reason="Error in Model.status(): model_run_id unknown"
             )
 
+        # Dummy behaviour: Query status once, to let finish model
+        run.state = ModelState.SUCCEEDED
+        return ModelRunInfo(
+            state=run.state,
+            model_run_id=model_run_id,
+        )
+
     def results(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
-            return ModelRunInfo(
-                state=self.model_run_dict[model_run_id].state,
-                model_run_id=model_run_id,
-                result=self.model_run_dict[model_run_id].result,
-            )
-        else:
+        run = self.model_run_dict.get(model_run_id)
+        if run is None:
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.ERROR,
                 reason="Error in Model.results(): model_run_id unknown"
             )
 
-    def remove(self, model_run_id: str):
-        if model_run_id in self.model_run_dict:
-            del self.model_run_dict[model_run_id]
-            # check if models are in pending state and accept the first one we find.
-            if len(self.model_run_dict.keys()) > 0:
-                for m in self.model_run_dict.values():
-                    if m.state == ModelState.PENDING:
-                        m.state == ModelState.ACCEPTED
-                        break
-
+        return ModelRunInfo(
+            state=run.state,
+            model_run_id=model_run_id,
+            result=run.result,
+        )
 
-            return ModelRunInfo(
-                model_run_id=model_run_id,
-                state=ModelState.UNKNOWN,
-            )
-        else:
+    def remove(self, model_run_id: str):
+        if self.model_run_dict.pop(model_run_id, None) is None:
             return ModelRunInfo(
                 model_run_id=model_run_id,
                 state=ModelState.ERROR,
                 reason="Error in Model.remove(): model_run_id unknown"
-            )
\ No newline at end of file
+            )
+
+        self._pending.pop(model_run_id, None)
+        # accept the oldest model run that is still pending
+        while self._pending:
+            pending_id, _ = self._pending.popitem(last=False)
+            pending_run = self.model_run_dict.get(pending_id)
+            if pending_run is not None and pending_run.state == ModelState.PENDING:
+                pending_run.state = ModelState.ACCEPTED
+                break
+
+        return ModelRunInfo(
+            model_run_id=model_run_id,
+            state=ModelState.UNKNOWN,
+        )
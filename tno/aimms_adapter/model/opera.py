@@ -21,7 +21,7 @@ logger = get_logger(__name__)
 class Opera(Model):
     def request(self):
 
-        model_run_id = str(uuid4())
+        model_run_id = uuid4().hex
         self.model_run_dict[model_run_id] = ModelRun(
             state=ModelState.ACCEPTED,
             config=None,
@@ -30,6 +30,7 @@ class Opera(Model):
         if len(self.model_run_dict.keys()) > 1:
             # there is already a model running
             self.model_run_dict[model_run_id].state = ModelState.PENDING
+            self._pending[model_run_id] = None
             return ModelRunInfo(
                 state=ModelState.PENDING,
                 reason="A model is already running",
@@ -41,6 +41,10 @@ class EnvSettings:
     def minio_secret_key():
         return os.getenv("MINIO_SECRET_KEY", "")
 
+    @staticmethod
+    def minio_pool_size() -> int:
+        return int(os.getenv("MINIO_POOL_SIZE") or 16)
+
     # Registry endpoint config
     @staticmethod
     def registry_endpoint():